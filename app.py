@@ -7,99 +7,285 @@ Or in Colab: Simply run this file
 """
 
 import os
+import asyncio
 import gradio as gr
-from keyterms_extractor import KeyTermsExtractor
-import json
+from keyterms_extractor import KeyTermsExtractor, WINDOW_CHARS, _CSV_FIELDS, _row_of
 import tempfile
 import csv
+import hashlib
+import threading
+import atexit
+import collections
+import uuid
+from typing import Deque, Dict, Optional, OrderedDict
 
-# Global extractor instance
-extractor = None
+try:
+    import chardet
+except ImportError:
+    chardet = None
 
-def initialize_extractor(api_key: str) -> str:
-    """Initialize the extractor with API key."""
-    global extractor
+# Separator lines used by format_as_table
+SEP70 = "=" * 70 + "\n"
+SEP50 = "-" * 50 + "\n"
+
+# How much of an uploaded file to inspect when guessing its encoding
+ENCODING_SNIFF_BYTES = 64 * 1024
+
+# Directory for downloadable CSV files, removed on exit; only the most
+# recent MAX_CSV_FILES files are kept
+MAX_CSV_FILES = 20
+_CSV_DIR = tempfile.TemporaryDirectory(prefix="keyterms_")
+atexit.register(_CSV_DIR.cleanup)
+_recent_csvs: Deque[str] = collections.deque()
+_recent_csvs_lock = threading.Lock()
+
+# Extractor instances shared across sessions, keyed by a hash of the API key;
+# only the MAX_EXTRACTORS most recently used are kept
+MAX_EXTRACTORS = 16
+_extractors: OrderedDict[str, KeyTermsExtractor] = collections.OrderedDict()
+_extractors_lock = threading.Lock()
+
+# Gradio queue settings: concurrent workers per event, waiting requests, and
+# how many file submissions are coalesced into one batched call
+QUEUE_CONCURRENCY = 4
+QUEUE_MAX_SIZE = 32
+MAX_BATCH_SIZE = 8
+
+NO_API_KEY = "❌ Please set your API key first. 請先設置您的 API 金鑰。"
+
+
+def get_extractor(api_key: Optional[str]) -> KeyTermsExtractor:
+    """
+    Return the extractor for an API key, creating it on first use and evicting the
+    least recently used beyond MAX_EXTRACTORS.
+    Falls back to MISTRAL_API_KEY when no key is given; raises ValueError if neither is set.
+    """
+    api_key = (api_key or "").strip()
+    key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+    
+    with _extractors_lock:
+        extractor = _extractors.get(key_hash)
+        if extractor is None:
+            extractor = KeyTermsExtractor(api_key=api_key or None)
+            _extractors[key_hash] = extractor
+            while len(_extractors) > MAX_EXTRACTORS:
+                _extractors.popitem(last=False)
+        else:
+            _extractors.move_to_end(key_hash)
+        return extractor
+
+
+def initialize_extractor(api_key: str) -> tuple:
+    """Validate the API key and store it in the session state."""
     try:
         if not api_key or not api_key.strip():
-            return "❌ Please enter your Mistral API key. 請輸入您的 Mistral API 金鑰。"
+            return "❌ Please enter your Mistral API key. 請輸入您的 Mistral API 金鑰。", None
         
-        extractor = KeyTermsExtractor(api_key=api_key.strip())
-        return "✅ API key validated successfully! 成功驗證 API 金鑰！"
+        get_extractor(api_key)
+        return "✅ API key validated successfully! 成功驗證 API 金鑰！", api_key.strip()
     except Exception as e:
-        return f"❌ Error 錯誤: {str(e)}"
+        return f"❌ Error 錯誤: {str(e)}", None
 
 
-def process_text(
+async def process_text(
     text: str, 
     custom_prompt: str,
-    output_format: str
-) -> tuple:
-    """Process text and extract terms."""
-    global extractor
-    
-    if extractor is None:
-        return "❌ Please set your API key first. 請先設置您的 API 金鑰。", None, None
+    output_format: str,
+    api_key: Optional[str] = None
+):
+    """Process text and extract terms, yielding partial results as they stream in."""
+    try:
+        extractor = get_extractor(api_key)
+    except ValueError:
+        yield NO_API_KEY, None, None
+        return
     
     if not text or not text.strip():
-        return "❌ Please enter text to analyze. 請輸入要分析的文本。", None, None
+        yield "❌ Please enter text to analyze. 請輸入要分析的文本。", None, None
+        return
+    
+    if len(text) > WINDOW_CHARS:
+        # Long texts are split into windows that are extracted in parallel
+        yield "", None, "⏳ Long text: extracting sections in parallel... 長文本：正在並行提取各部分……"
+        try:
+            terms = await extractor.aextract_long(text, custom_prompt)
+            if terms is None:
+                yield (
+                    "❌ Extraction failed for part of the text. Please try again. "
+                    "文本部分內容提取失敗，請重試。",
+                    None,
+                    None
+                )
+            else:
+                yield build_outputs(extractor, terms, output_format)
+        except Exception as e:
+            yield f"❌ Error 錯誤: {str(e)}", None, None
+        return
+    
+    loop = asyncio.get_running_loop()
     
     try:
-        # Extract terms
-        terms = extractor.extract(text, custom_prompt)
+        # Extract terms, refreshing the output as each term arrives. The Mistral
+        # stream is blocking, so each step runs in a worker thread to keep the
+        # event loop free for other sessions.
+        stream = extractor.extract_stream(text, custom_prompt)
+        terms = None
+        while True:
+            try:
+                update = await loop.run_in_executor(None, next, stream, None)
+            except Exception as e:
+                if not terms:
+                    raise
+                # Keep what arrived but make clear it is partial; no CSV for incomplete results
+                yield (
+                    format_terms(extractor, terms, output_format),
+                    None,
+                    f"❌ Extraction incomplete, showing {len(terms)} terms received before the error. "
+                    f"提取未完成，僅顯示出錯前收到的 {len(terms)} 個術語。{str(e)}"
+                )
+                return
+            if update is None:
+                break
+            terms = update
+            progress = f"⏳ Extracting... {len(terms)} terms so far. 提取中……已提取 {len(terms)} 個術語。"
+            yield format_terms(extractor, terms, output_format), None, progress
         
-        if not terms:
-            return "❌ No terms extracted. Please try different text. 未提取到術語，請嘗試不同的文本。", None, None
+        yield build_outputs(extractor, terms, output_format)
         
-        # Format output based on selection
-        if output_format == "Markdown 表格":
-            output = extractor._to_markdown(terms)
-        elif output_format == "JSON":
-            output = json.dumps(terms, ensure_ascii=False, indent=2)
-        else:  # Table format
-            output = format_as_table(terms)
+    except Exception as e:
+        yield f"❌ Error 錯誤: {str(e)}", None, None
+
+
+def format_terms(extractor: KeyTermsExtractor, terms: list, output_format: str) -> str:
+    """Format terms for display in the selected output format."""
+    if output_format == "Markdown 表格":
+        return extractor._to_markdown(terms)
+    elif output_format == "JSON":
+        return extractor._to_json(terms)
+    else:  # Table format
+        return format_as_table(terms)
+
+
+def build_outputs(extractor: KeyTermsExtractor, terms: list, output_format: str) -> tuple:
+    """Build the (output, csv_path, summary) tuple for extracted terms."""
+    if not terms:
+        return "❌ No terms extracted. Please try different text. 未提取到術語，請嘗試不同的文本。", None, None
+    
+    output = format_terms(extractor, terms, output_format)
+    
+    # Create downloadable CSV
+    csv_path = create_csv_file(terms)
+    
+    # Create summary
+    summary = f"✅ Successfully extracted {len(terms)} terms. 成功提取 {len(terms)} 個術語。"
+    
+    return output, csv_path, summary
+
+
+async def process_file(
+    files: list,
+    custom_prompts: list,
+    output_formats: list,
+    api_keys: list
+) -> tuple:
+    """
+    Process a batch of uploaded files and extract terms.
+    
+    Gradio groups near-simultaneous submissions into one call (batch=True), so
+    every argument is a list with one entry per submission. Files that share
+    an API key and custom prompt are extracted together through shared
+    batched requests.
+    """
+    results = [None] * len(files)
+    groups: Dict[tuple, list] = {}
+    loop = asyncio.get_running_loop()
+    
+    for i, (file, custom_prompt, api_key) in enumerate(zip(files, custom_prompts, api_keys)):
+        try:
+            extractor = get_extractor(api_key)
+        except ValueError:
+            results[i] = NO_API_KEY, None, None
+            continue
         
-        # Create downloadable CSV
-        csv_path = create_csv_file(terms)
+        if file is None:
+            results[i] = "❌ Please upload a file. 請上傳文件。", None, None
+            continue
         
-        # Create summary
-        summary = f"✅ Successfully extracted {len(terms)} terms. 成功提取 {len(terms)} 個術語。"
+        try:
+            text = await loop.run_in_executor(None, read_text_file, file.name)
+        except Exception as e:
+            # Fail only this submission, not the whole batch
+            results[i] = f"❌ Could not read file 無法讀取文件: {str(e)}", None, None
+            continue
         
-        return output, csv_path, summary
+        if text is None:
+            results[i] = "❌ Could not read file encoding. 無法讀取文件編碼。", None, None
+        elif not text.strip():
+            results[i] = "❌ The uploaded file is empty. 上傳的文件為空。", None, None
+        else:
+            groups.setdefault((extractor, custom_prompt), []).append((i, text))
+    
+    async def run_group(extractor: KeyTermsExtractor, custom_prompt: str, items: list) -> None:
+        try:
+            # Repeated paragraphs are extracted once; the rest are batched and
+            # sent concurrently on Gradio's event loop
+            term_lists = await extractor.aextract_documents([text for _, text in items], custom_prompt)
+            for (i, _), terms in zip(items, term_lists):
+                if terms is None:
+                    results[i] = (
+                        "❌ Extraction failed for part of the file. Please try again. "
+                        "文件部分內容提取失敗，請重試。",
+                        None,
+                        None
+                    )
+                else:
+                    results[i] = build_outputs(extractor, terms, output_formats[i])
         
-    except Exception as e:
-        return f"❌ Error 錯誤: {str(e)}", None, None
+        except Exception as e:
+            for i, _ in items:
+                results[i] = f"❌ Error 錯誤: {str(e)}", None, None
+    
+    await asyncio.gather(*(
+        run_group(extractor, custom_prompt, items)
+        for (extractor, custom_prompt), items in groups.items()
+    ))
+    
+    outputs, csv_paths, summaries = zip(*results)
+    return list(outputs), list(csv_paths), list(summaries)
 
 
-def process_file(
-    file,
-    custom_prompt: str,
-    output_format: str
-) -> tuple:
-    """Process uploaded file and extract terms."""
-    global extractor
+def read_text_file(path: str):
+    """Read a text file with a single read, detecting its encoding. Returns None if undecodable."""
+    with open(path, 'rb') as f:
+        data = f.read()
     
-    if extractor is None:
-        return "❌ Please set your API key first. 請先設置您的 API 金鑰。", None, None
+    # Byte-order marks settle the encoding immediately
+    if data[:3] == b'\xef\xbb\xbf':
+        return data.decode('utf-8-sig', errors='replace')
+    if data[:2] in (b'\xff\xfe', b'\xfe\xff'):
+        return data.decode('utf-16', errors='replace')
     
-    if file is None:
-        return "❌ Please upload a file. 請上傳文件。", None, None
+    if data.isascii():
+        return data.decode('ascii')
     
     try:
-        # Read file content
-        with open(file.name, 'r', encoding='utf-8') as f:
-            text = f.read()
+        return data.decode('utf-8')
     except UnicodeDecodeError:
-        try:
-            with open(file.name, 'r', encoding='gbk') as f:
-                text = f.read()
-        except:
-            try:
-                with open(file.name, 'r', encoding='big5') as f:
-                    text = f.read()
-            except:
-                return "❌ Could not read file encoding. 無法讀取文件編碼。", None, None
+        pass
     
-    return process_text(text, custom_prompt, output_format)
+    # Guess from a bounded prefix, then fall back to common CJK encodings
+    candidates = ['gbk', 'big5']
+    if chardet is not None:
+        detected = chardet.detect(data[:ENCODING_SNIFF_BYTES]).get('encoding')
+        if detected:
+            candidates.insert(0, detected)
+    
+    for encoding in candidates:
+        try:
+            return data.decode(encoding)
+        except (UnicodeDecodeError, LookupError):
+            continue
+    return None
 
 
 def format_as_table(terms: list) -> str:
@@ -107,50 +293,43 @@ def format_as_table(terms: list) -> str:
     if not terms:
         return "No terms found."
     
-    output = "📚 EXTRACTED KEY TERMS 提取的關鍵術語\n"
-    output += "=" * 70 + "\n\n"
+    parts = ["📚 EXTRACTED KEY TERMS 提取的關鍵術語\n", SEP70, "\n"]
     
     for i, term in enumerate(terms, 1):
-        output += f"【{i}】 {term.get('term', 'N/A')}\n"
-        output += f"    📖 Translation 翻譯: {term.get('translation', 'N/A')}\n"
-        output += f"    📝 Definition (EN): {term.get('definition_en', term.get('definition', 'N/A'))}\n"
-        output += f"    📝 定義 (中文): {term.get('definition_zh', 'N/A')}\n"
-        output += f"    🏷️  Category 類別: {term.get('category', 'N/A')}\n"
-        output += "-" * 50 + "\n"
+        parts.extend((
+            f"【{i}】 {term.get('term', 'N/A')}\n",
+            f"    📖 Translation 翻譯: {term.get('translation', 'N/A')}\n",
+            f"    📝 Definition (EN): {term.get('definition_en', term.get('definition', 'N/A'))}\n",
+            f"    📝 定義 (中文): {term.get('definition_zh', 'N/A')}\n",
+            f"    🏷️  Category 類別: {term.get('category', 'N/A')}\n",
+            SEP50,
+        ))
     
-    output += f"\n✅ Total 總計: {len(terms)} terms 術語"
-    return output
+    parts.append(f"\n✅ Total 總計: {len(terms)} terms 術語")
+    return "".join(parts)
 
 
 def create_csv_file(terms: list) -> str:
-    """Create a temporary CSV file for download."""
+    """Create a temporary CSV file for download, evicting the oldest beyond MAX_CSV_FILES."""
     if not terms:
         return None
     
-    temp_file = tempfile.NamedTemporaryFile(
-        mode='w', 
-        suffix='.csv', 
-        delete=False, 
-        encoding='utf-8-sig',
-        newline=''
-    )
-    
-    fieldnames = ['term', 'translation', 'definition_en', 'definition_zh', 'category']
-    writer = csv.DictWriter(temp_file, fieldnames=fieldnames, extrasaction='ignore')
-    writer.writeheader()
+    path = os.path.join(_CSV_DIR.name, f"terms_{uuid.uuid4().hex[:8]}.csv")
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(_CSV_FIELDS)
+        writer.writerows(_row_of(term) for term in terms)
     
-    for term in terms:
-        row = {
-            'term': term.get('term', ''),
-            'translation': term.get('translation', ''),
-            'definition_en': term.get('definition_en', term.get('definition', '')),
-            'definition_zh': term.get('definition_zh', ''),
-            'category': term.get('category', '')
-        }
-        writer.writerow(row)
+    with _recent_csvs_lock:
+        _recent_csvs.append(path)
+        while len(_recent_csvs) > MAX_CSV_FILES:
+            stale = _recent_csvs.popleft()
+            try:
+                os.unlink(stale)
+            except FileNotFoundError:
+                pass
     
-    temp_file.close()
-    return temp_file.name
+    return path
 
 
 # Create Gradio Interface
@@ -187,10 +366,13 @@ def create_interface():
                 interactive=False
             )
         
+        # Per-session API key; falls back to MISTRAL_API_KEY when unset
+        api_key_state = gr.State(None)
+        
         validate_btn.click(
             fn=initialize_extractor,
             inputs=[api_key_input],
-            outputs=[api_status]
+            outputs=[api_status, api_key_state]
         )
         
         gr.Markdown("---")
@@ -243,14 +425,18 @@ def create_interface():
         # Event handlers
         extract_text_btn.click(
             fn=process_text,
-            inputs=[text_input, custom_prompt, output_format],
+            inputs=[text_input, custom_prompt, output_format, api_key_state],
             outputs=[result_output, csv_download, status_output]
         )
         
+        # Batched: Gradio passes per-submission values of data components, so
+        # the key comes from the key textbox rather than the session State
         extract_file_btn.click(
             fn=process_file,
-            inputs=[file_input, custom_prompt, output_format],
-            outputs=[result_output, csv_download, status_output]
+            inputs=[file_input, custom_prompt, output_format, api_key_input],
+            outputs=[result_output, csv_download, status_output],
+            batch=True,
+            max_batch_size=MAX_BATCH_SIZE
         )
         
         clear_btn.click(
@@ -293,9 +479,9 @@ def create_interface():
 if __name__ == "__main__":
     # Check for API key in environment
     if os.environ.get("MISTRAL_API_KEY"):
-        extractor = KeyTermsExtractor()
         print("✅ API key loaded from environment variable.")
     
     # Create and launch interface
     demo = create_interface()
+    demo.queue(default_concurrency_limit=QUEUE_CONCURRENCY, max_size=QUEUE_MAX_SIZE)
     demo.launch(share=True)
@@ -9,23 +9,446 @@ GitHub: https://github.com/digimarketingai
 
 import os
 import re
+import time
+import random
+import asyncio
 import json
 import csv
-from typing import Optional, List, Dict
+import hashlib
+import tempfile
+import threading
+import weakref
+import collections
+from typing import Optional, List, Dict, Tuple, Iterator, OrderedDict
 
 try:
     from mistralai import Mistral
 except ImportError:
     raise ImportError("Please install mistralai: pip install mistralai")
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Keywords that mark a custom prompt as relevant to term extraction.
+# 表示自定義提示與術語提取相關的關鍵字。
+_RELEVANCE_KEYWORDS_EN = (
+    "term", "extract", "focus", "only", "include", "exclude", "type",
+    "category", "field", "domain", "technical", "medical", "legal",
+    "scientific", "business", "ignore", "skip", "important", "key",
+    "specific", "related", "terminology", "vocabulary", "jargon",
+)
+# Traditional & Simplified Chinese. 繁體及簡體中文。
+_RELEVANCE_KEYWORDS_ZH = (
+    "詞", "词", "術語", "术语", "提取", "專業", "专业", "領域", "领域",
+    "技術", "技术", "醫學", "医学", "法律", "科學", "科学", "商業", "商业",
+    "忽略", "重要", "關鍵", "关键", "特定", "相關", "相关", "類型", "类型",
+)
+_RELEVANCE_EN_RE = re.compile("|".join(re.escape(k) for k in _RELEVANCE_KEYWORDS_EN), re.IGNORECASE)
+_RELEVANCE_ZH_RE = re.compile("|".join(re.escape(k) for k in _RELEVANCE_KEYWORDS_ZH))
+_MIN_EN_KEYWORD_LEN = min(len(k) for k in _RELEVANCE_KEYWORDS_EN)
+
+# Horizontal rule between terms in markdown output. Markdown 輸出中術語之間的分隔線。
+_MD_RULE = "---\n\n"
+
+# Incremental parsing of a streamed {"terms": [...]} reply.
+# 串流 {"terms": [...]} 回應的增量解析。
+_TERMS_ARRAY_RE = re.compile(r'"terms"\s*:\s*\[')
+_ITEM_GAP_RE = re.compile(r'[\s,]*')
+_JSON_DECODER = json.JSONDecoder()
+
+# CSV column order for exported terms. 匯出術語的 CSV 欄位順序。
+_CSV_FIELDS = ('term', 'translation', 'definition_en', 'definition_zh', 'category')
+
+
+def _row_of(term: Dict) -> Tuple[str, ...]:
+    """
+    CSV row for a term, in _CSV_FIELDS order (handles both old and new formats).
+    按 _CSV_FIELDS 順序生成術語的 CSV 行（兼容新舊格式）。
+    """
+    return (
+        term.get('term', ''),
+        term.get('translation', ''),
+        term.get('definition_en', term.get('definition', '')),
+        term.get('definition_zh', ''),
+        term.get('category', ''),
+    )
+
+
+# Blank lines separate the paragraphs of a document. 文檔段落以空行分隔。
+_PARAGRAPH_SPLIT_RE = re.compile(r'\n\s*\n')
+
+# Sentence ends, used to split paragraphs that are too long for one window. Latin
+# punctuation only ends a sentence when whitespace follows, so decimals, file names
+# and domains stay intact; CJK punctuation needs no whitespace.
+# 句末標點，用於拆分超出單個窗口的段落。英文標點後須有空白才視為句末，
+# 以免拆開小數、文件名及網域；中文標點則無需空白。
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+|(?<=[。！？])\s*')
+
+# Default window size (in characters, roughly 3k tokens) for chunk_text().
+# chunk_text() 的預設窗口大小（字元數，約 3k token）。
+WINDOW_CHARS = 8000
+
+# Rough characters-per-token ratio used to size batched requests.
+# 用於估算批次請求大小的字元/token 粗略比例。
+_CHARS_PER_TOKEN = 3
+
+# Maximum estimated input tokens packed into a single batched request.
+# 單個批次請求可容納的估計輸入 token 上限。
+_BATCH_TOKEN_BUDGET = 6000
+
+# Longest text sent in one request; longer inputs are truncated.
+# 單次請求發送的最長文本；更長的輸入將被截斷。
+_MAX_TEXT_CHARS = 12000
+
+# Output token budget: fixed overhead plus an allowance per expected term, kept
+# between a generous floor and a ceiling. Replies cut off at the limit are retried
+# once with the ceiling.
+# 輸出 token 預算：固定開銷加上每個預期術語的額度，限制在寬鬆下限與上限之間；
+# 因達到上限而被截斷的回應會以上限重試一次。
+_OUTPUT_TOKEN_OVERHEAD = 200
+_TOKENS_PER_TERM = 120
+_MIN_OUTPUT_TOKENS = 4096
+_MAX_OUTPUT_TOKENS = 16384
+
+# HTTP status codes worth retrying (rate limits and transient server errors).
+# 值得重試的 HTTP 狀態碼（速率限制及暫時性伺服器錯誤）。
+_RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# Exponential backoff settings, in seconds. 指數退避設定（秒）。
+_BACKOFF_BASE = 1.0
+_BACKOFF_CAP = 30.0
+_BACKOFF_JITTER = 1.0
+
+# Reset headers at or above this value are epoch timestamps rather than delays (~2001-09-09)
+# 重設標頭值不小於此值時視為 epoch 時間戳而非延遲秒數
+_EPOCH_THRESHOLD = 1_000_000_000
+
+
+# Eviction trims the disk cache to this fraction of its cap, so that it does not
+# have to run again on every write. 淘汰時將磁碟快取削減至上限的此比例，避免每次寫入都重新淘汰。
+_CACHE_EVICT_RATIO = 0.9
+
+# In-process memo of recently read cache files, shared by all extractors.
+# 程序內最近讀取的快取文件記憶，由所有提取器共享。
+_CACHE_MEMO_SIZE = 512
+_cache_memo: OrderedDict[str, str] = collections.OrderedDict()
+_cache_memo_lock = threading.Lock()
+
+# New entries written to each cache directory since it was last scanned.
+# 各快取目錄自上次掃描以來新寫入的項目數。
+_cache_dir_writes: Dict[str, int] = {}
+_cache_dir_lock = threading.Lock()
+
+
+def _read_cache_file(path: str) -> str:
+    """
+    Read a cache entry, memoized in-process. Missing files raise and are not memoized.
+    讀取快取項目並在程序內記憶；不存在的文件會拋出例外且不會被記憶。
+    """
+    with _cache_memo_lock:
+        if path in _cache_memo:
+            _cache_memo.move_to_end(path)
+            return _cache_memo[path]
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    with _cache_memo_lock:
+        _cache_memo[path] = content
+        while len(_cache_memo) > _CACHE_MEMO_SIZE:
+            _cache_memo.popitem(last=False)
+    return content
+
+
+def _forget_cache_file(path: str) -> None:
+    """Drop ``path`` from the in-process memo. 從程序內記憶中移除 ``path``。"""
+    with _cache_memo_lock:
+        _cache_memo.pop(path, None)
+
+
+def _document_paragraphs(texts: List[str]) -> Tuple[List[str], List[List[int]]]:
+    """
+    Split documents into paragraphs, deduplicated across all of them.
+    將文檔拆分為段落，並在所有文檔間去重。
+
+    Paragraphs longer than WINDOW_CHARS are split further with chunk_text() so
+    that none is truncated. Returns the unique non-empty paragraphs, and for each
+    document the indices of its paragraphs in that list, in document order.
+    超過 WINDOW_CHARS 的段落會再以 chunk_text() 拆分，以免被截斷。
+    返回不重複的非空段落，以及每個文檔按順序對應的段落索引。
+    """
+    index: Dict[bytes, int] = {}
+    paragraphs = []
+    layout = []
+    for text in texts:
+        positions = {}
+        for paragraph in _PARAGRAPH_SPLIT_RE.split(text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            pieces = chunk_text(paragraph) if len(paragraph) > WINDOW_CHARS else [paragraph]
+            for piece in pieces:
+                digest = hashlib.blake2b(piece.encode(), digest_size=16).digest()
+                i = index.get(digest)
+                if i is None:
+                    i = index[digest] = len(paragraphs)
+                    paragraphs.append(piece)
+                positions[i] = None
+        layout.append(list(positions))
+    return paragraphs, layout
+
+
+def _merge_documents(
+    results: List[Optional[List[Dict]]],
+    layout: List[List[int]]
+) -> List[Optional[List[Dict]]]:
+    """
+    Merge per-paragraph results into per-document term lists; a document is None
+    if any of its paragraphs failed.
+    將段落結果合併為各文檔的術語列表；任何段落提取失敗的文檔為 None。
+    """
+    merged = []
+    for positions in layout:
+        term_lists = [results[i] for i in positions]
+        merged.append(None if any(terms is None for terms in term_lists) else _merge_terms(term_lists))
+    return merged
+
+
+def _term_list(value) -> Optional[List[Dict]]:
+    """
+    Return ``value`` as a list of term dicts, unwrapping {"terms": [...]}, or None if it is not one.
+    將 ``value`` 作為術語字典列表返回（會解開 {"terms": [...]}）；格式不符則返回 None。
+    """
+    if isinstance(value, dict):
+        value = value.get("terms")
+    if isinstance(value, list) and all(isinstance(term, dict) for term in value):
+        return value
+    return None
+
+
+def _merge_terms(term_lists: List[Optional[List[Dict]]]) -> List[Dict]:
+    """
+    Merge term lists in one pass, collapsing terms that differ only in case or surrounding space.
+    一次遍歷合併術語列表，合併僅大小寫或前後空白不同的術語。
+
+    Terms keep the position of their first occurrence; when a term repeats, the
+    entry with the longer English definition wins.
+    術語保留首次出現的位置；重複時保留英文定義較長者。
+    """
+    merged: Dict[str, Dict] = {}
+    for terms in term_lists:
+        for term in terms or ():
+            key = str(term.get('term', '')).strip().lower()
+            current = merged.setdefault(key, term)
+            if current is not term and len(_definition_en(term)) > len(_definition_en(current)):
+                merged[key] = term
+    return list(merged.values())
+
+
+def _definition_en(term: Dict) -> str:
+    """English definition of a term (handles both old and new formats). 術語的英文定義（兼容新舊格式）。"""
+    return str(term.get('definition_en', term.get('definition', '')))
+
+
+def chunk_text(text: str, max_chars: int = WINDOW_CHARS) -> List[str]:
+    """
+    Split text into windows of at most ``max_chars`` characters, on paragraph boundaries where possible.
+    將文本拆分為最多 ``max_chars`` 字元的窗口，盡量在段落邊界處拆分。
+
+    Paragraphs are packed greedily; a paragraph longer than a window is split on
+    sentence ends, and a sentence longer than a window is cut at ``max_chars``.
+    Pieces of the same paragraph are rejoined with a space, paragraphs with a blank line.
+    段落會被貪婪地打包；超出窗口的段落按句末拆分，超出窗口的句子則按 ``max_chars`` 截斷。
+    同一段落的片段以空格重新連接，不同段落之間以空行連接。
+    """
+    # (paragraph number, text) pairs
+    pieces = []
+    for n, paragraph in enumerate(_PARAGRAPH_SPLIT_RE.split(text)):
+        paragraph = paragraph.strip()
+        if len(paragraph) <= max_chars:
+            if paragraph:
+                pieces.append((n, paragraph))
+            continue
+        for sentence in filter(None, _SENTENCE_SPLIT_RE.split(paragraph)):
+            pieces.extend(
+                (n, sentence[i:i + max_chars]) for i in range(0, len(sentence), max_chars)
+            )
+
+    windows, window, size, last = [], "", 0, None
+    for n, piece in pieces:
+        sep = " " if n == last else "\n\n"
+        if window and size + len(sep) + len(piece) > max_chars:
+            windows.append(window)
+            window, size = "", 0
+        if window:
+            window += sep
+            size += len(sep)
+        window += piece
+        size += len(piece)
+        last = n
+    if window:
+        windows.append(window)
+    return windows
+
+
+def _load_json_reply(response_text: str):
+    """
+    Parse a model reply as JSON, tolerating prose or code fences around the payload.
+    將模型回應解析為 JSON，容許負載前後出現說明文字或程式碼圍欄。
+
+    Falls back to decoding from the first ``{`` or ``[``; raises ValueError if nothing parses.
+    解析失敗時從第一個 ``{`` 或 ``[`` 開始解碼；皆無法解析則拋出 ValueError。
+    """
+    try:
+        return json.loads(response_text)
+    except ValueError:
+        pass
+    starts = [i for i in (response_text.find('{'), response_text.find('[')) if i != -1]
+    if not starts:
+        raise ValueError("No JSON found in response")
+    payload, _ = _JSON_DECODER.raw_decode(response_text, min(starts))
+    return payload
+
+
+def _truncate(text: str) -> str:
+    """
+    Truncate text to the per-request character cap, with a warning.
+    將文本截斷至單次請求的字元上限，並發出警告。
+    """
+    if len(text) <= _MAX_TEXT_CHARS:
+        return text
+    print(f"⚠️ Text truncated from {len(text)} to {_MAX_TEXT_CHARS} characters. "
+          f"文本已從 {len(text)} 字元截斷至 {_MAX_TEXT_CHARS} 字元。")
+    return text[:_MAX_TEXT_CHARS]
+
+
+def _estimated_terms(text: str) -> int:
+    """Rough number of terms the model will return for ``text``. 估計模型會為 ``text`` 返回的術語數。"""
+    return min(50, max(5, min(len(text), _MAX_TEXT_CHARS) // 500))
+
+
+def _generation_params(texts: List[str]) -> Dict:
+    """
+    Sampling parameters with an output-token ceiling sized to the inputs.
+    根據輸入大小設定輸出 token 上限的生成參數。
+    """
+    est_terms = sum(_estimated_terms(t) for t in texts)
+    return {
+        "response_format": {"type": "json_object"},
+        "temperature": 0.2,
+        "max_tokens": min(
+            _MAX_OUTPUT_TOKENS,
+            max(_MIN_OUTPUT_TOKENS, _OUTPUT_TOKEN_OVERHEAD + est_terms * _TOKENS_PER_TERM),
+        ),
+    }
+
+
+def _pack_batches(texts: List[str], indices: List[int]) -> List[List[int]]:
+    """
+    Group text indices into batches that stay under the input token budget and
+    whose estimated reply fits within _MAX_OUTPUT_TOKENS.
+    將文本索引分組，使每批不超過輸入 token 預算，且預估回應不超過 _MAX_OUTPUT_TOKENS。
+    """
+    batches, batch, used, output = [], [], 0, _OUTPUT_TOKEN_OVERHEAD
+    for i in indices:
+        cost = len(texts[i]) // _CHARS_PER_TOKEN
+        reply = _estimated_terms(texts[i]) * _TOKENS_PER_TERM
+        if batch and (used + cost > _BATCH_TOKEN_BUDGET or output + reply > _MAX_OUTPUT_TOKENS):
+            batches.append(batch)
+            batch, used, output = [], 0, _OUTPUT_TOKEN_OVERHEAD
+        batch.append(i)
+        used += cost
+        output += reply
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class _TermStreamParser:
+    """
+    Incrementally pull term objects out of a streamed {"terms": [...]} reply.
+    從串流的 {"terms": [...]} 回應中逐步解析術語物件。
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = None  # index of the next unparsed item inside the terms array
+        self._done = False
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Append a chunk and return the term objects it completed. 追加片段並返回新完成的術語物件。"""
+        self.buffer += chunk
+        if self._pos is None:
+            match = _TERMS_ARRAY_RE.search(self.buffer)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        terms = []
+        while not self._done:
+            start = _ITEM_GAP_RE.match(self.buffer, self._pos).end()
+            if start >= len(self.buffer):
+                break
+            if self.buffer[start] == "]":
+                self._done = True
+                break
+            try:
+                term, self._pos = _JSON_DECODER.raw_decode(self.buffer, start)
+            except json.JSONDecodeError:
+                break  # the object is still incomplete
+            if isinstance(term, dict):
+                terms.append(term)
+        return terms
+
 
 class KeyTermsExtractor:
     """
     A class to extract key terms from text and provide translations/definitions.
     從文本中提取關鍵術語並提供翻譯/定義的工具類。
     """
+
+    # Static system prompt, shared by every request so it can be prompt-cached.
+    # 所有請求共用的靜態系統提示，以便利用提示快取。
+    _BASE_SYSTEM = """You are a professional terminology extractor and translator.
+Analyze the text provided by the user and extract all key terms (technical terms, domain-specific vocabulary,
+important concepts, proper nouns, and specialized terminology).
+
+For each term, provide:
+1. The original term
+2. Translation (English if the term is in Chinese/other language, Traditional Chinese 繁體中文 if the term is in English)
+3. A clear, concise definition (provide in both English and Traditional Chinese)
+
+Describe each term as a JSON object containing:
+- "term": the original term
+- "translation": the translation
+- "definition_en": definition in English
+- "definition_zh": definition in Traditional Chinese (繁體中文)
+- "category": the type of term (e.g., "technical", "concept", "proper noun", "domain-specific", etc.)
+"""
+
+    _TERMS_SYSTEM = _BASE_SYSTEM + """
+Return ONLY a JSON object {"terms": [...]} where "terms" is the list of term objects. No prose.
+僅回應 {"terms": [...]} 形式的 JSON 物件，不要有其他文字。"""
+
+    _BATCH_SYSTEM = _BASE_SYSTEM + """
+The user message contains several separate inputs, each starting with a ---INPUT n--- marker.
+Extract the key terms of each input separately.
+Return ONLY a JSON object {"results": [[...], [...], ...]} where "results" holds
+one list of term objects per input, in input order. No prose.
+用戶訊息包含多段以 ---INPUT n--- 標記開頭的獨立輸入，請分別提取各段的關鍵術語，
+並僅回應 {"results": [[...], ...]} 形式的 JSON 物件，依輸入順序排列。"""
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "mistral-medium-latest"):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: str = "mistral-medium-latest",
+        max_concurrent: int = 2,
+        max_retries: int = 3,
+        timeout: float = 30,
+        cache_dir: Optional[str] = "~/.keyterms_cache",
+        cache_max_entries: int = 1000
+    ):
         """
         Initialize the KeyTermsExtractor.
         初始化術語提取器。
@@ -35,6 +458,18 @@ class KeyTermsExtractor:
                      Mistral API 金鑰。如果為 None，將嘗試從環境變數獲取。
             model: Mistral model to use.
                    使用的 Mistral 模型。
+            max_concurrent: Maximum number of async API requests this extractor has in flight
+                            at once on each event loop, shared by all async method calls.
+                            此提取器在每個事件迴圈上同時進行的非同步 API 請求數上限，
+                            由所有非同步方法呼叫共享。
+            max_retries: Retries for rate-limited (429) or failed (5xx) API requests.
+                         API 請求遇到速率限制 (429) 或伺服器錯誤 (5xx) 時的重試次數。
+            timeout: Request timeout in seconds.
+                     請求逾時秒數。
+            cache_dir: Directory for cached extraction results, or None to disable caching.
+                       提取結果的快取目錄，設為 None 則停用快取。
+            cache_max_entries: Maximum number of cached results; the least recently used are evicted.
+                               快取結果數量上限；超出時移除最久未使用的項目。
         """
         self.api_key = api_key or os.environ.get("MISTRAL_API_KEY")
         
@@ -45,27 +480,41 @@ class KeyTermsExtractor:
             )
         
         self.model = model
-        self.client = Mistral(api_key=self.api_key)
+        self.max_concurrent = max_concurrent
+        # One semaphore per event loop, shared by every async call on this extractor
+        # 每個事件迴圈一個信號量，由此提取器的所有非同步呼叫共享
+        self._limiters = weakref.WeakKeyDictionary()
+        self._limiters_lock = threading.Lock()
+        self.max_retries = max_retries
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+        self.cache_max_entries = cache_max_entries
+        self.client = Mistral(api_key=self.api_key, timeout_ms=int(timeout * 1000))
     
     def _is_relevant_prompt(self, custom_prompt: str) -> bool:
         """
         Check if the custom prompt is relevant to term extraction.
         檢查自定義提示是否與術語提取相關。
         """
-        relevance_keywords = [
-            # English keywords
-            "term", "extract", "focus", "only", "include", "exclude", "type",
-            "category", "field", "domain", "technical", "medical", "legal",
-            "scientific", "business", "ignore", "skip", "important", "key", 
-            "specific", "related", "terminology", "vocabulary", "jargon",
-            # Chinese keywords (Traditional & Simplified)
-            "詞", "词", "術語", "术语", "提取", "專業", "专业", "領域", "领域",
-            "技術", "技术", "醫學", "医学", "法律", "科學", "科学", "商業", "商业",
-            "忽略", "重要", "關鍵", "关键", "特定", "相關", "相关", "類型", "类型"
-        ]
-        
-        return any(keyword.lower() in custom_prompt.lower() for keyword in relevance_keywords)
-    
+        # ASCII prompts cannot contain Chinese keywords, nor English ones if too short
+        if custom_prompt.isascii():
+            if len(custom_prompt) < _MIN_EN_KEYWORD_LEN:
+                return False
+            return bool(_RELEVANCE_EN_RE.search(custom_prompt))
+        return bool(_RELEVANCE_EN_RE.search(custom_prompt) or _RELEVANCE_ZH_RE.search(custom_prompt))
+
+    def _custom_instruction(self, custom_prompt: str) -> str:
+        """
+        Build the additional-instructions suffix for a custom prompt, if relevant.
+        如自定義提示相關，則生成額外指令後綴。
+        """
+        if not custom_prompt or not custom_prompt.strip():
+            return ""
+        if self._is_relevant_prompt(custom_prompt):
+            return f"\n\nAdditional Instructions 額外指令: {custom_prompt}"
+        print(f"ℹ️ Custom prompt ignored (not related to term extraction): {custom_prompt[:50]}...")
+        print(f"ℹ️ 自定義提示已忽略（與術語提取無關）：{custom_prompt[:50]}...")
+        return ""
+
     def extract(
         self, 
         text: str, 
@@ -93,97 +542,664 @@ class KeyTermsExtractor:
             print("⚠️ Empty text provided. 提供的文本為空。")
             return None
         
-        # Build the extraction prompt
-        base_instruction = """You are a professional terminology extractor and translator. 
-Analyze the following text and extract all key terms (technical terms, domain-specific vocabulary, 
-important concepts, proper nouns, and specialized terminology).
+        cache_key = self._cache_key(text, custom_prompt)
+        terms = self._cache_get(cache_key)
+        if terms is None:
+            messages = self._messages(text, custom_prompt)
 
-For each term, provide:
-1. The original term
-2. Translation (English if the term is in Chinese/other language, Traditional Chinese 繁體中文 if the term is in English)
-3. A clear, concise definition (provide in both English and Traditional Chinese)
+            try:
+                # Call Mistral API
+                content = self._complete(messages, [text])
+                terms = self._parse_terms(content)
+                    
+            except Exception as e:
+                print(f"❌ Error 錯誤: {str(e)}")
+                return None
 
-Format your response as a JSON array with objects containing:
-- "term": the original term
-- "translation": the translation
-- "definition_en": definition in English
-- "definition_zh": definition in Traditional Chinese (繁體中文)
-- "category": the type of term (e.g., "technical", "concept", "proper noun", "domain-specific", etc.)
-"""
+            if terms is None:
+                return None
+            self._cache_put(cache_key, terms)
 
-        # Add custom prompt if provided and relevant
-        custom_instruction = ""
-        if custom_prompt and custom_prompt.strip():
-            if self._is_relevant_prompt(custom_prompt):
-                custom_instruction = f"\n\nAdditional Instructions 額外指令: {custom_prompt}"
-            else:
-                print(f"ℹ️ Custom prompt ignored (not related to term extraction): {custom_prompt[:50]}...")
-                print(f"ℹ️ 自定義提示已忽略（與術語提取無關）：{custom_prompt[:50]}...")
+        return self._format_terms(terms, output_format)
 
-        # Construct the full prompt
-        full_prompt = f"""{base_instruction}{custom_instruction}
+    def extract_stream(
+        self,
+        text: str,
+        custom_prompt: str = ""
+    ) -> Iterator[List[Dict]]:
+        """
+        Extract key terms, yielding results progressively as the reply streams in.
+        提取關鍵術語，並在回應串流期間逐步產出結果。
 
-TEXT TO ANALYZE 要分析的文本:
-\"\"\"
-{text}
-\"\"\"
+        Args:
+            text: The input text to analyze.
+                  要分析的輸入文本。
+            custom_prompt: Optional custom instructions for term extraction.
+                          可選的自定義術語提取指令。
 
-Please extract all key terms and respond ONLY with a valid JSON array. No additional text.
-請提取所有關鍵術語，僅回應有效的 JSON 陣列，不要有其他文字。"""
+        Yields:
+            The list of terms extracted so far; the last list yielded is the complete result.
+            目前已提取的術語列表；最後產出的列表為完整結果。
 
+        Raises:
+            RuntimeError: If the request fails, the reply is cut off, or the complete reply
+                          cannot be parsed. Terms yielded before the error are incomplete.
+                          請求失敗、回應被截斷或完整回應無法解析時拋出；之前產出的術語並不完整。
+        """
+        if not text or not text.strip():
+            print("⚠️ Empty text provided. 提供的文本為空。")
+            return
+
+        cache_key = self._cache_key(text, custom_prompt)
+        terms = self._cache_get(cache_key)
+        if terms is not None:
+            yield terms
+            return
+
+        parser = _TermStreamParser()
+        terms = []
+        finish_reason = None
         try:
-            # Call Mistral API
-            chat_response = self.client.chat.complete(
+            stream = self._call_with_retry(
+                self.client.chat.stream,
                 model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": full_prompt,
-                    }
-                ]
+                messages=self._messages(text, custom_prompt),
+                **_generation_params([text])
             )
-            
-            response_text = chat_response.choices[0].message.content
-            
-            # Parse JSON from the response
-            json_match = re.search(r'\[[\s\S]*\]', response_text)
-            if json_match:
-                terms = json.loads(json_match.group())
-                
-                # Handle output format
-                if output_format == "json":
-                    return json.dumps(terms, ensure_ascii=False, indent=2)
-                elif output_format == "markdown":
-                    return self._to_markdown(terms)
-                else:
-                    return terms
-            else:
-                print("⚠️ Could not parse JSON response. 無法解析 JSON 回應。")
-                print(f"Raw response 原始回應: {response_text}")
-                return None
-                
+            # Older mistralai 1.x releases return a plain generator rather than a
+            # context manager, so iterate directly and close explicitly
+            try:
+                for event in stream:
+                    choice = event.data.choices[0]
+                    finish_reason = choice.finish_reason or finish_reason
+                    delta = choice.delta.content
+                    if not isinstance(delta, str) or not delta:
+                        continue
+                    new_terms = parser.feed(delta)
+                    if new_terms:
+                        terms.extend(new_terms)
+                        yield list(terms)
+            finally:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    close()
+
         except Exception as e:
-            print(f"❌ Error 錯誤: {str(e)}")
+            raise RuntimeError(f"Extraction stream failed 提取串流失敗: {str(e)}") from e
+
+        if finish_reason == "length":
+            raise RuntimeError(
+                "Reply was cut off at the token limit; results are incomplete. "
+                "回應因達到 token 上限而被截斷，結果不完整。"
+            )
+
+        # Parse the complete reply as well, in case the incremental scan missed items
+        complete = self._parse_terms(parser.buffer)
+        if complete is None:
+            raise RuntimeError("Could not parse the complete reply. 無法解析完整回應。")
+        if complete != terms:
+            yield complete
+        self._cache_put(cache_key, complete)
+
+    async def aextract(
+        self,
+        text: str,
+        custom_prompt: str = "",
+        output_format: str = "dict"
+    ) -> Optional[List[Dict]]:
+        """
+        Async version of extract().
+        extract() 的非同步版本。
+
+        Args and return value are the same as extract().
+        參數和返回值與 extract() 相同。
+        """
+        if not text or not text.strip():
+            print("⚠️ Empty text provided. 提供的文本為空。")
             return None
-    
+
+        cache_key = self._cache_key(text, custom_prompt)
+        terms = self._cache_get(cache_key)
+        if terms is None:
+            messages = self._messages(text, custom_prompt)
+
+            try:
+                content = await self._acomplete(messages, [text])
+                terms = self._parse_terms(content)
+
+            except Exception as e:
+                print(f"❌ Error 錯誤: {str(e)}")
+                return None
+
+            if terms is None:
+                return None
+            self._cache_put(cache_key, terms)
+
+        return self._format_terms(terms, output_format)
+
+    async def aextract_many(
+        self,
+        texts: List[str],
+        custom_prompt: str = ""
+    ) -> List[Optional[List[Dict]]]:
+        """
+        Extract key terms from several texts concurrently, one API call per text.
+        並行地從多段文本中提取關鍵術語，每段文本一個 API 請求。
+
+        Requests share the extractor's limiter, so at most ``max_concurrent`` are in
+        flight at once across all concurrent calls on the same event loop.
+        請求共享提取器的限流器，同一事件迴圈上所有並行呼叫合計最多 ``max_concurrent`` 個。
+
+        Args:
+            texts: The input texts to analyze.
+                   要分析的輸入文本列表。
+            custom_prompt: Optional custom instructions for term extraction.
+                          可選的自定義術語提取指令。
+
+        Returns:
+            One list of terms per input text, in input order (None where extraction failed).
+            每段輸入文本對應一個術語列表，順序與輸入相同（提取失敗者為 None）。
+        """
+        return list(await asyncio.gather(*(self.aextract(text, custom_prompt) for text in texts)))
+
+    async def aextract_long(self, text: str, custom_prompt: str = "") -> Optional[List[Dict]]:
+        """
+        Extract key terms from a text too long for a single request.
+        從單次請求無法容納的長文本中提取關鍵術語。
+
+        The text is split into windows with chunk_text(), the windows are extracted
+        concurrently via aextract_many(), and the results are merged without duplicates.
+        Terms that appear in only one window are still included.
+        文本以 chunk_text() 拆分為窗口，透過 aextract_many() 並行提取，再去重合併結果；
+        僅出現在單個窗口中的術語同樣會被保留。
+
+        Args:
+            text: The input text to analyze.
+                  要分析的輸入文本。
+            custom_prompt: Optional custom instructions for term extraction.
+                          可選的自定義術語提取指令。
+
+        Returns:
+            The merged list of terms from all windows, or None if any window failed.
+            所有窗口合併後的術語列表；任何窗口提取失敗時返回 None。
+        """
+        results = await self.aextract_many(chunk_text(text), custom_prompt)
+        return _merge_documents(results, [list(range(len(results)))])[0]
+
+    def _messages(self, text: str, custom_prompt: str) -> List[Dict]:
+        """Build the chat messages for a single text. 生成單段文本的對話訊息。"""
+        custom_instruction = self._custom_instruction(custom_prompt)
+
+        return [
+            {"role": "system", "content": self._TERMS_SYSTEM + custom_instruction},
+            {"role": "user", "content": f'TEXT TO ANALYZE 要分析的文本:\n"""\n{_truncate(text)}\n"""'},
+        ]
+
+    def _parse_terms(self, response_text: str) -> Optional[List[Dict]]:
+        """Parse the term list out of a single-text response. 從單段回應中解析術語列表。"""
+        try:
+            payload = _load_json_reply(response_text)
+            # A bare array is accepted as well as the requested {"terms": [...]}
+            terms = _term_list(payload)
+        except (ValueError, TypeError):
+            terms = None
+        if terms is not None:
+            return terms
+
+        print("⚠️ Could not parse JSON response. 無法解析 JSON 回應。")
+        print(f"Raw response 原始回應: {response_text}")
+        return None
+
+    def _format_terms(self, terms: List[Dict], output_format: str = "dict"):
+        """Convert terms to the requested output format. 將術語轉換為指定的輸出格式。"""
+        if output_format == "json":
+            return self._to_json(terms)
+        elif output_format == "markdown":
+            return self._to_markdown(terms)
+        else:
+            return terms
+
+    def _cache_key(self, text: str, custom_prompt: str) -> str:
+        """Content-addressed cache key for an extraction. 提取結果的內容定址快取鍵。"""
+        return hashlib.sha256(f"{self.model}|{custom_prompt}|{text}".encode()).hexdigest()
+
+    def _cache_path(self, key: str) -> str:
+        """File path of the cache entry for ``key``. ``key`` 對應的快取文件路徑。"""
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _cache_get(self, key: str) -> Optional[List[Dict]]:
+        """Return cached terms for ``key``, or None on a miss. 返回快取的術語，未命中則返回 None。"""
+        if not self.cache_dir:
+            return None
+        path = self._cache_path(key)
+        try:
+            terms = _term_list(json.loads(_read_cache_file(path)))
+        except (OSError, ValueError):
+            return None
+        if terms is None:
+            return None
+        # Refresh the mtime so eviction drops least recently used entries first
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process since it was memoized
+            _forget_cache_file(path)
+            return None
+        except OSError:
+            pass
+        return terms
+
+    def _cache_put(self, key: str, terms: List[Dict]) -> None:
+        """Store terms under ``key``. 以 ``key`` 保存術語。"""
+        if not self.cache_dir:
+            return
+        path = self._cache_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so readers never see a partial entry
+            with tempfile.NamedTemporaryFile(
+                'w', dir=os.path.dirname(path), delete=False, encoding='utf-8'
+            ) as f:
+                json.dump(terms, f, ensure_ascii=False)
+            existed = os.path.exists(path)
+            os.replace(f.name, path)
+        except OSError as e:
+            print(f"⚠️ Could not write cache 無法寫入快取: {str(e)}")
+            return
+        _forget_cache_file(path)
+
+        if existed:
+            return
+        # Re-count from disk once enough new entries may have been written, by any
+        # extractor sharing the directory, to reach the cap
+        # 當共用此目錄的提取器新寫入的項目可能已達上限時，重新從磁碟計數
+        slack = max(1, self.cache_max_entries - self._cache_target())
+        with _cache_dir_lock:
+            writes = _cache_dir_writes.get(self.cache_dir, slack - 1) + 1
+            _cache_dir_writes[self.cache_dir] = 0 if writes >= slack else writes
+        if writes >= slack:
+            self._evict_cache()
+
+    def _cache_target(self) -> int:
+        """Number of entries eviction trims the cache to. 淘汰後保留的項目數。"""
+        return int(self.cache_max_entries * _CACHE_EVICT_RATIO)
+
+    def _cache_files(self) -> List[Tuple[float, str]]:
+        """(mtime, path) of every cache entry. 返回所有快取項目的 (修改時間, 路徑)。"""
+        entries = []
+        try:
+            subdirs = os.scandir(self.cache_dir)
+        except OSError:
+            return entries
+        with subdirs:
+            for subdir in subdirs:
+                if not subdir.is_dir():
+                    continue
+                try:
+                    with os.scandir(subdir.path) as files:
+                        for entry in files:
+                            if len(entry.name) == 64 and entry.name.startswith(subdir.name):
+                                entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+        return entries
+
+    def _evict_cache(self) -> None:
+        """
+        Scan the cache and, if it has grown past the eviction target, delete the oldest
+        entries down to it, so the cache stays within ``cache_max_entries`` until the next scan.
+        掃描快取，若超過淘汰目標則刪除最舊的項目直至目標數，使快取在下次掃描前不超過上限。
+        """
+        entries = self._cache_files()
+        excess = len(entries) - self._cache_target()
+        if excess <= 0:
+            return
+        entries.sort()
+        for _, path in entries[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            _forget_cache_file(path)
+
+    def _cached_results(
+        self,
+        texts: List[str],
+        custom_prompt: str
+    ) -> Tuple[List[Optional[List[Dict]]], List[int]]:
+        """
+        Look up each text in the cache; return the results so far and the indices still to extract.
+        在快取中查找每段文本；返回目前結果及仍需提取的索引。
+        """
+        results: List[Optional[List[Dict]]] = [None] * len(texts)
+        misses = []
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                continue
+            results[i] = self._cache_get(self._cache_key(text, custom_prompt))
+            if results[i] is None:
+                misses.append(i)
+        return results, misses
+
+    def _store_batch(
+        self,
+        results: List[Optional[List[Dict]]],
+        texts: List[str],
+        batch: List[int],
+        batch_terms: List[List[Dict]],
+        custom_prompt: str
+    ) -> None:
+        """Record one sub-batch's terms in ``results`` and the cache. 將子批次的術語寫入結果及快取。"""
+        for i, terms in zip(batch, batch_terms):
+            results[i] = terms
+            self._cache_put(self._cache_key(texts[i], custom_prompt), terms)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before retrying a failed request, or None if it should not be retried
+        (including when the server asks for a wait longer than the backoff cap).
+        返回重試前應等待的秒數；如不應重試（包括伺服器要求的等待超過退避上限）則返回 None。
+        """
+        if attempt >= self.max_retries:
+            return None
+        if getattr(error, "status_code", None) not in _RETRYABLE_STATUS:
+            return None
+
+        # Honor the server's hint when one is given, but give up rather than
+        # wait longer than the backoff cap
+        response = getattr(error, "raw_response", None) or getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        for header in ("retry-after", "x-ratelimit-reset"):
+            try:
+                delay = float(headers.get(header))
+            except (TypeError, ValueError):
+                continue
+            # x-ratelimit-reset may be an absolute epoch timestamp
+            if header == "x-ratelimit-reset" and delay >= _EPOCH_THRESHOLD:
+                delay -= time.time()
+            if delay > _BACKOFF_CAP:
+                return None
+            return max(0.0, delay)
+
+        return min(_BACKOFF_CAP, _BACKOFF_BASE * 2 ** attempt) + random.uniform(0, _BACKOFF_JITTER)
+
+    def _complete(self, messages: List[Dict], texts: List[str]) -> str:
+        """
+        Request a completion for ``texts`` and return its content, retrying once with the
+        full output budget if the reply was cut off at the token limit.
+        為 ``texts`` 請求回應並返回其內容；若回應因達到 token 上限而被截斷，則以完整輸出預算重試一次。
+        """
+        params = _generation_params(texts)
+        while True:
+            chat_response = self._call_with_retry(
+                self.client.chat.complete, model=self.model, messages=messages, **params
+            )
+            choice = chat_response.choices[0]
+            if choice.finish_reason != "length" or params["max_tokens"] >= _MAX_OUTPUT_TOKENS:
+                return choice.message.content
+            print(f"⚠️ Reply truncated at {params['max_tokens']} tokens, retrying with {_MAX_OUTPUT_TOKENS}... "
+                  f"回應在 {params['max_tokens']} 個 token 處被截斷，以 {_MAX_OUTPUT_TOKENS} 重試...")
+            params["max_tokens"] = _MAX_OUTPUT_TOKENS
+
+    async def _acomplete(self, messages: List[Dict], texts: List[str]) -> str:
+        """Async version of _complete(). _complete() 的非同步版本。"""
+        params = _generation_params(texts)
+        while True:
+            chat_response = await self._acall_with_retry(
+                self.client.chat.complete_async, model=self.model, messages=messages, **params
+            )
+            choice = chat_response.choices[0]
+            if choice.finish_reason != "length" or params["max_tokens"] >= _MAX_OUTPUT_TOKENS:
+                return choice.message.content
+            print(f"⚠️ Reply truncated at {params['max_tokens']} tokens, retrying with {_MAX_OUTPUT_TOKENS}... "
+                  f"回應在 {params['max_tokens']} 個 token 處被截斷，以 {_MAX_OUTPUT_TOKENS} 重試...")
+            params["max_tokens"] = _MAX_OUTPUT_TOKENS
+
+    def _call_with_retry(self, func, **kwargs):
+        """Call ``func``, retrying transient API errors with backoff. 呼叫 ``func``，遇暫時性錯誤時退避重試。"""
+        attempt = 0
+        while True:
+            try:
+                return func(**kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                print(f"⏳ Request failed ({e}), retrying in {delay:.1f}s... 請求失敗，{delay:.1f} 秒後重試...")
+                time.sleep(delay)
+                attempt += 1
+
+    def _limiter(self) -> asyncio.Semaphore:
+        """
+        The semaphore bounding this extractor's requests on the running event loop.
+        返回限制此提取器在當前事件迴圈上請求數的信號量。
+        """
+        loop = asyncio.get_running_loop()
+        with self._limiters_lock:
+            sem = self._limiters.get(loop)
+            if sem is None:
+                sem = self._limiters[loop] = asyncio.Semaphore(self.max_concurrent)
+            return sem
+
+    async def _acall_with_retry(self, func, **kwargs):
+        """
+        Async version of _call_with_retry(); holds a slot of the extractor's limiter.
+        _call_with_retry() 的非同步版本；執行期間佔用提取器限流器的一個名額。
+        """
+        attempt = 0
+        async with self._limiter():
+            while True:
+                try:
+                    return await func(**kwargs)
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt)
+                    if delay is None:
+                        raise
+                    print(f"⏳ Request failed ({e}), retrying in {delay:.1f}s... 請求失敗，{delay:.1f} 秒後重試...")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+
+    def extract_batch(
+        self,
+        texts: List[str],
+        custom_prompt: str = ""
+    ) -> List[Optional[List[Dict]]]:
+        """
+        Extract key terms from several texts using as few API calls as possible.
+        以盡量少的 API 請求從多段文本中提取關鍵術語。
+
+        Texts are packed into numbered sections of a single prompt, split into
+        sub-batches whenever the estimated input size exceeds the token budget.
+        文本會被合併為單個提示中的編號段落，超出 token 預算時會拆分為多個子批次。
+
+        Args:
+            texts: The input texts to analyze.
+                   要分析的輸入文本列表。
+            custom_prompt: Optional custom instructions for term extraction.
+                          可選的自定義術語提取指令。
+
+        Returns:
+            One list of terms per input text, in input order (None where extraction failed).
+            每段輸入文本對應一個術語列表，順序與輸入相同（提取失敗者為 None）。
+        """
+        if not any(text and text.strip() for text in texts):
+            print("⚠️ Empty text provided. 提供的文本為空。")
+            return [None] * len(texts)
+
+        results, indices = self._cached_results(texts, custom_prompt)
+        if not indices:
+            return results
+
+        custom_instruction = self._custom_instruction(custom_prompt)
+
+        for batch in _pack_batches(texts, indices):
+            batch_texts = [texts[i] for i in batch]
+            try:
+                content = self._complete(
+                    self._batch_messages(batch_texts, custom_instruction), batch_texts
+                )
+                batch_terms = self._parse_batch(content, len(batch_texts))
+            except Exception as e:
+                print(f"❌ Error 錯誤: {str(e)}")
+                continue
+
+            if batch_terms is not None:
+                self._store_batch(results, texts, batch, batch_terms, custom_prompt)
+
+        return results
+
+    async def aextract_batch(
+        self,
+        texts: List[str],
+        custom_prompt: str = ""
+    ) -> List[Optional[List[Dict]]]:
+        """
+        Async version of extract_batch(); sub-batches are sent concurrently.
+        extract_batch() 的非同步版本；各子批次會並行發送。
+
+        Requests share the extractor's limiter, so at most ``max_concurrent`` are in
+        flight at once across all concurrent calls on the same event loop.
+        請求共享提取器的限流器，同一事件迴圈上所有並行呼叫合計最多 ``max_concurrent`` 個。
+        """
+        if not any(text and text.strip() for text in texts):
+            print("⚠️ Empty text provided. 提供的文本為空。")
+            return [None] * len(texts)
+
+        results, indices = self._cached_results(texts, custom_prompt)
+        if not indices:
+            return results
+
+        custom_instruction = self._custom_instruction(custom_prompt)
+
+        async def run(batch: List[int]) -> Optional[List[List[Dict]]]:
+            batch_texts = [texts[i] for i in batch]
+            try:
+                content = await self._acomplete(
+                    self._batch_messages(batch_texts, custom_instruction), batch_texts
+                )
+                return self._parse_batch(content, len(batch_texts))
+            except Exception as e:
+                print(f"❌ Error 錯誤: {str(e)}")
+                return None
+
+        batches = _pack_batches(texts, indices)
+        for batch, batch_terms in zip(batches, await asyncio.gather(*(run(batch) for batch in batches))):
+            if batch_terms is not None:
+                self._store_batch(results, texts, batch, batch_terms, custom_prompt)
+
+        return results
+
+    def extract_document(self, text: str, custom_prompt: str = "") -> Optional[List[Dict]]:
+        """
+        Extract key terms from a multi-paragraph document.
+        從多段落文檔中提取關鍵術語。
+
+        Paragraphs are split on blank lines; repeated paragraphs (boilerplate,
+        headers) are sent only once, and the unique ones are batched via extract_batch().
+        段落以空行分隔；重複段落（樣板文字、標題）只發送一次，其餘段落透過 extract_batch() 批次處理。
+
+        Args:
+            text: The document text.
+                  文檔文本。
+            custom_prompt: Optional custom instructions for term extraction.
+                          可選的自定義術語提取指令。
+
+        Returns:
+            The terms of all paragraphs in document order, without duplicates, or None
+            if extraction failed for any paragraph.
+            按文檔順序排列、已去重的所有段落術語；任何段落提取失敗時返回 None。
+        """
+        return self.extract_documents([text], custom_prompt)[0]
+
+    async def aextract_document(self, text: str, custom_prompt: str = "") -> Optional[List[Dict]]:
+        """
+        Async version of extract_document(); sub-batches are sent concurrently.
+        extract_document() 的非同步版本；各子批次會並行發送。
+        """
+        return (await self.aextract_documents([text], custom_prompt))[0]
+
+    def extract_documents(self, texts: List[str], custom_prompt: str = "") -> List[Optional[List[Dict]]]:
+        """
+        Extract key terms from several documents, sharing batched API calls between them.
+        從多個文檔中提取關鍵術語，各文檔共用批次 API 請求。
+
+        Works like extract_document(), but paragraphs repeated across documents
+        are also sent only once.
+        與 extract_document() 相同，但跨文檔重複的段落同樣只發送一次。
+
+        Returns:
+            One merged term list per document, in input order (None where any paragraph failed).
+            每個文檔對應一個合併後的術語列表，順序與輸入相同（任何段落提取失敗者為 None）。
+        """
+        paragraphs, layout = _document_paragraphs(texts)
+        results = self.extract_batch(paragraphs, custom_prompt)
+        return _merge_documents(results, layout)
+
+    async def aextract_documents(self, texts: List[str], custom_prompt: str = "") -> List[Optional[List[Dict]]]:
+        """
+        Async version of extract_documents(); sub-batches are sent concurrently.
+        extract_documents() 的非同步版本；各子批次會並行發送。
+        """
+        paragraphs, layout = _document_paragraphs(texts)
+        results = await self.aextract_batch(paragraphs, custom_prompt)
+        return _merge_documents(results, layout)
+
+    def _batch_messages(self, texts: List[str], custom_instruction: str) -> List[Dict]:
+        """Build chat messages holding several numbered inputs. 生成包含多段編號輸入的對話訊息。"""
+        sections = "".join(f"\n---INPUT {i}---\n{_truncate(text)}\n" for i, text in enumerate(texts))
+        return [
+            {"role": "system", "content": self._BATCH_SYSTEM + custom_instruction},
+            {"role": "user", "content": f"TEXTS TO ANALYZE ({len(texts)} inputs) 要分析的文本（共 {len(texts)} 段）:\n{sections}"},
+        ]
+
+    def _parse_batch(self, response_text: str, count: int) -> Optional[List[List[Dict]]]:
+        """Parse a batched response into one term list per input. 將批次回應解析為每段輸入的術語列表。"""
+        try:
+            payload = _load_json_reply(response_text)
+            batch_terms = payload.get("results") if isinstance(payload, dict) else payload
+        except (ValueError, TypeError):
+            batch_terms = None
+        if isinstance(batch_terms, list) and len(batch_terms) == count:
+            # Each result must itself be a term list (or {"terms": [...]})
+            batch_terms = [_term_list(terms) for terms in batch_terms]
+            if all(terms is not None for terms in batch_terms):
+                return batch_terms
+
+        print("⚠️ Could not parse batched JSON response. 無法解析批次 JSON 回應。")
+        print(f"Raw response 原始回應: {response_text}")
+        return None
+
+    def _to_json(self, terms: List[Dict]) -> str:
+        """
+        Convert terms to indented JSON, using orjson when installed.
+        將術語轉換為縮排 JSON，如已安裝 orjson 則使用之。
+        """
+        if orjson is not None:
+            return orjson.dumps(terms, option=orjson.OPT_INDENT_2).decode()
+        return json.dumps(terms, ensure_ascii=False, indent=2)
+
     def _to_markdown(self, terms: List[Dict]) -> str:
         """Convert terms to markdown format. 將術語轉換為 Markdown 格式。"""
         if not terms:
             return "No terms extracted. 未提取到術語。"
         
-        md = "# Extracted Key Terms 提取的關鍵術語\n\n"
-        md += f"**Total terms 術語總數: {len(terms)}**\n\n"
-        md += "---\n\n"
+        parts = [
+            "# Extracted Key Terms 提取的關鍵術語\n\n",
+            f"**Total terms 術語總數: {len(terms)}**\n\n",
+            _MD_RULE,
+        ]
         
         for i, term in enumerate(terms, 1):
-            md += f"## {i}. {term.get('term', 'N/A')}\n\n"
-            md += f"**Translation 翻譯:** {term.get('translation', 'N/A')}\n\n"
-            md += f"**Category 類別:** {term.get('category', 'N/A')}\n\n"
-            md += f"**Definition (EN):** {term.get('definition_en', term.get('definition', 'N/A'))}\n\n"
-            md += f"**定義 (中文):** {term.get('definition_zh', 'N/A')}\n\n"
-            md += "---\n\n"
+            parts.extend((
+                f"## {i}. {term.get('term', 'N/A')}\n\n",
+                f"**Translation 翻譯:** {term.get('translation', 'N/A')}\n\n",
+                f"**Category 類別:** {term.get('category', 'N/A')}\n\n",
+                f"**Definition (EN):** {term.get('definition_en', term.get('definition', 'N/A'))}\n\n",
+                f"**定義 (中文):** {term.get('definition_zh', 'N/A')}\n\n",
+                _MD_RULE,
+            ))
         
-        return md
+        return "".join(parts)
     
     def extract_from_file(
         self, 
@@ -250,22 +1266,10 @@ Please extract all key terms and respond ONLY with a valid JSON array. No additi
             return False
         
         try:
-            fieldnames = ['term', 'translation', 'definition_en', 'definition_zh', 'category']
-            
             with open(output_path, 'w', newline='', encoding='utf-8-sig') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
-                writer.writeheader()
-                
-                for term in terms:
-                    # Handle both old and new format
-                    row = {
-                        'term': term.get('term', ''),
-                        'translation': term.get('translation', ''),
-                        'definition_en': term.get('definition_en', term.get('definition', '')),
-                        'definition_zh': term.get('definition_zh', ''),
-                        'category': term.get('category', '')
-                    }
-                    writer.writerow(row)
+                writer = csv.writer(f)
+                writer.writerow(_CSV_FIELDS)
+                writer.writerows(_row_of(term) for term in terms)
             
             print(f"✅ Saved to {output_path}. 已保存至 {output_path}。")
             return True